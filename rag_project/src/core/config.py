@@ -27,6 +27,10 @@ GUARDRAIL_MODELS = {
 
 # Embedding Model (Local)
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# Preferred inference backend: "onnx" runs MiniLM through ONNX Runtime
+# (2-3x faster than eager PyTorch on CPU); falls back to "torch" if the
+# onnx extras are not installed.
+EMBEDDING_BACKEND = "onnx"
 
 # --- Paths ---
 DATA_FOLDER = "rag_data_source"
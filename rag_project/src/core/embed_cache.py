@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+import numpy as np
+
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+# Vectors are unit-normalized, so values lie in [-1, 1] and symmetric
+# int8 quantization with a fixed scale loses almost no precision.
+QUANT_SCALE = 127.0
+
+class EmbedCache:
+    """
+    Content-addressed embedding cache backed by sqlite.
+    Key = hash(model_name + chunk text), value = int8-quantized vector
+    bytes (4x smaller than float32; dequantized on read).
+    Re-ingesting unchanged chunks becomes a lookup instead of a
+    transformer forward pass.
+    """
+    def __init__(self, cache_path: str = ".embed_cache.sqlite3"):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.cache_path, check_same_thread=False)
+        # Table renamed when the storage format moved to int8; a legacy
+        # float32 cache is dropped rather than misread. Checked against
+        # sqlite_master so the DDL only runs when migrating, not on
+        # every startup.
+        legacy = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'embeddings'"
+        ).fetchone()
+        if legacy is not None:
+            logger.info("Dropping legacy float32 embedding cache table.")
+            self._conn.execute("DROP TABLE embeddings")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings_q8 (key BLOB PRIMARY KEY, vec BLOB)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> bytes:
+        # Same backend preference as ingestion's _hash_bytes: xxh3 first,
+        # then blake3, MD5 as the portable fallback. 128-bit digests keep
+        # collision odds negligible at millions of chunks.
+        payload = f"{model_name}\0{text}".encode('utf-8')
+        if xxhash is not None:
+            return xxhash.xxh3_128(payload).digest()
+        if blake3 is not None:
+            return blake3.blake3(payload).digest()
+        return hashlib.md5(payload).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Returns {key: vector} for the keys present in the cache.
+        """
+        hits = {}
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT vec FROM embeddings_q8 WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    quantized = np.frombuffer(row[0], dtype=np.int8)
+                    hits[key] = quantized.astype(np.float32) / QUANT_SCALE
+        return hits
+
+    def put_many(self, items: Dict[bytes, np.ndarray]):
+        if not items:
+            return
+
+        def _quantize(vec: np.ndarray) -> bytes:
+            return np.clip(np.round(np.asarray(vec) * QUANT_SCALE), -128, 127).astype(np.int8).tobytes()
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings_q8 (key, vec) VALUES (?, ?)",
+                [(key, _quantize(vec)) for key, vec in items.items()]
+            )
+            self._conn.commit()
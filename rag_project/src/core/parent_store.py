@@ -0,0 +1,71 @@
+import sqlite3
+import json
+import threading
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+class ParentStore:
+    """
+    sqlite-backed store for parent documents in small-to-big retrieval:
+    children are embedded and searched, parents are what the LLM sees.
+    """
+    def __init__(self, store_path: str = ".parent_store.sqlite3"):
+        self.store_path = store_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.store_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parents ("
+            "id TEXT PRIMARY KEY, text TEXT, meta TEXT, source_file_hash TEXT)"
+        )
+        self._conn.commit()
+
+    def put_many(self, parents: Dict[str, Document]):
+        if not parents:
+            return
+        rows = [
+            (
+                parent_id,
+                doc.page_content,
+                json.dumps(doc.metadata),
+                doc.metadata.get("source_file_hash", "")
+            )
+            for parent_id, doc in parents.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO parents (id, text, meta, source_file_hash) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def get_many(self, parent_ids: List[str]) -> Dict[str, Document]:
+        found = {}
+        with self._lock:
+            for parent_id in parent_ids:
+                row = self._conn.execute(
+                    "SELECT text, meta FROM parents WHERE id = ?", (parent_id,)
+                ).fetchone()
+                if row is not None:
+                    found[parent_id] = Document(page_content=row[0], metadata=json.loads(row[1]))
+        return found
+
+    def delete_by_file_hash(self, file_hashes: List[str]):
+        if not file_hashes:
+            return
+        with self._lock:
+            placeholders = ",".join("?" for _ in file_hashes)
+            self._conn.execute(
+                f"DELETE FROM parents WHERE source_file_hash IN ({placeholders})",
+                file_hashes
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM parents")
+            self._conn.commit()
@@ -2,12 +2,28 @@ import os
 import json
 import re
 import sys
+import asyncio
+import threading
 from typing import List, Optional, Literal
 from pydantic import BaseModel, Field
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Precompiled once; both orjson and stdlib raise ValueError subclasses.
+_THINK_RE = re.compile(r'<think>.*?</think>', re.DOTALL)
+
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -33,6 +49,16 @@ class TestSuite(BaseModel):
     status: Optional[str] = Field(None, description="Status code, e.g., 'missing_info'")
     missing_info_questions: Optional[List[str]] = Field(None, description="Specific questions if context is missing")
 
+# Precompiled JSON Schema validator: ~10x faster than re-running full
+# Pydantic validation on every LLM response.
+if fastjsonschema is not None:
+    try:
+        _VALIDATE_TESTSUITE = fastjsonschema.compile(TestSuite.model_json_schema())
+    except Exception:
+        _VALIDATE_TESTSUITE = None
+else:
+    _VALIDATE_TESTSUITE = None
+
 # --- Generator Class ---
 class GenerationEngine:
     def __init__(self, model_name: str = "llama-3.3-70b-versatile", guardrail_model: Optional[str] = None):
@@ -62,23 +88,33 @@ class GenerationEngine:
         
         self.parser = PydanticOutputParser(pydantic_object=TestSuite)
 
-    def _check_safety(self, query: str) -> bool:
+        # One long-lived event loop on a background thread. The engine
+        # (and ChatGroq's async httpx client with its keep-alive pool)
+        # outlives many generate() calls, and pooled connections are
+        # bound to the loop they were opened on — a fresh asyncio.run
+        # per call would reuse them across dead loops and fail with
+        # "Event loop is closed" on repeat calls.
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+
+    async def _check_safety(self, query: str) -> bool:
         """
         Checks if the query is safe using the guardrail model.
         Returns True if safe, False if unsafe.
         """
         if not self.guard_llm:
             return True
-            
+
         try:
-            # Simple prompt for checking safety. 
+            # Simple prompt for checking safety.
             # Note: Specialized Llama Guard usage typically uses formatted prompts.
             # Here we rely on the model's instruction following to classify.
             messages = [
                 ("system", "You are a safety classification system. Analyze the user prompt. If it is safe and related to software development/testing, reply 'SAFE'. If it is harmful, illegal, or malicious, reply 'UNSAFE'."),
                 ("user", query)
             ]
-            response = self.guard_llm.invoke(messages)
+            response = await self.guard_llm.ainvoke(messages)
             content = response.content.strip().upper()
             
             logger.info(f"Guardrail Check ({self.guardrail_model}): {content}")
@@ -93,15 +129,36 @@ class GenerationEngine:
             logger.warning("Proceeding despite guardrail error.")
             return True
 
+    def _build_suite(self, data: dict) -> TestSuite:
+        """
+        Validates the parsed payload against the precompiled schema and
+        constructs the models without re-running Pydantic validation.
+        Falls back to full Pydantic validation if the fast path rejects it.
+        """
+        if _VALIDATE_TESTSUITE is not None:
+            try:
+                _VALIDATE_TESTSUITE(data)
+                cases = [TestCase.model_construct(**tc) for tc in data.get("test_cases") or []]
+                return TestSuite.model_construct(
+                    test_cases=cases,
+                    status=data.get("status"),
+                    missing_info_questions=data.get("missing_info_questions")
+                )
+            except fastjsonschema.JsonSchemaException:
+                logger.warning("Fast schema validation failed. Falling back to Pydantic.")
+        return TestSuite(**data)
+
     def generate(self, query: str, context_chunks: List[str]) -> TestSuite:
-        # 1. Guardrail Check
-        if not self._check_safety(query):
-            return TestSuite(
-                test_cases=[], 
-                status="unsafe", 
-                missing_info_questions=["The request was blocked by the safety guardrail."]
-            )
+        """
+        Synchronous entry point; runs the async pipeline on the engine's
+        persistent background loop.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._agenerate(query, context_chunks), self._loop
+        )
+        return future.result()
 
+    async def _agenerate(self, query: str, context_chunks: List[str]) -> TestSuite:
         context_text = "\n\n".join(context_chunks)
         
         if not context_chunks:
@@ -129,33 +186,46 @@ class GenerationEngine:
         ])
         
         chain = prompt | self.llm
-        
+
         try:
             logger.info(f"Sending query to Groq LLM ({self.output_model})...")
-            response = chain.invoke({
-                "context": context_text, 
+            # Start guardrail and generation concurrently: both are pure
+            # network I/O, so latency becomes max(guard, gen) not the sum.
+            guard_task = asyncio.create_task(self._check_safety(query))
+            gen_task = asyncio.create_task(chain.ainvoke({
+                "context": context_text,
                 "query": query,
                 "format_instructions": self.parser.get_format_instructions()
-            })
-            
+            }))
+
+            if not await guard_task:
+                gen_task.cancel()
+                return TestSuite(
+                    test_cases=[],
+                    status="unsafe",
+                    missing_info_questions=["The request was blocked by the safety guardrail."]
+                )
+
+            response = await gen_task
             content = response.content
             
             # Cleanup <think> tags
-            content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
-            
+            content = _THINK_RE.sub('', content).strip()
+
             # Parse
             try:
-                return self.parser.parse(content)
-            except Exception:
-                # Fallback JSON regex
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group()
-                    data = json.loads(json_str)
-                    return TestSuite(**data)
-                else:
+                data = _json_loads(content)
+            except ValueError:
+                # Fallback: slice from the first '{' to the last '}' —
+                # a linear scan instead of a backtracking DOTALL regex.
+                start = content.find('{')
+                end = content.rfind('}')
+                if start == -1 or end <= start:
                     raise ValueError("No JSON found in response")
-            
+                data = _json_loads(content[start:end + 1])
+
+            return self._build_suite(data)
+
         except Exception as e:
             logger.error(f"Generation Error: {e}")
             return TestSuite(
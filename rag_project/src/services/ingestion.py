@@ -1,13 +1,47 @@
 import os
-import glob
+import json
+import mmap
+import uuid
 import hashlib
 import base64
-from typing import List, Optional
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    from datasketch import MinHash, MinHashLSH
+except ImportError:
+    MinHash = None
+    MinHashLSH = None
+
+try:
+    from semantic_text_splitter import TextSplitter as RustTextSplitter
+except ImportError:
+    RustTextSplitter = None
+
+try:
+    import chardet
+except ImportError:
+    chardet = None
+import io
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from langchain_core.documents import Document
-from langchain_community.document_loaders import TextLoader, Docx2txtLoader, UnstructuredWordDocumentLoader
+from langchain_community.document_loaders import UnstructuredWordDocumentLoader
 from groq import Groq
-import pymupdf4llm
+import docx2txt
+import fitz
 import sys
 
 # Add parent directory to path to allow imports from core
@@ -19,159 +53,757 @@ from core.config import GROQ_API_KEY
 # Initialize Logger
 logger = setup_logger()
 
+IMAGE_EXTS = [".png", ".jpg", ".jpeg", ".tiff", ".bmp"]
+
+IMAGE_MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".tiff": "image/tiff",
+    ".bmp": "image/bmp",
+}
+
+def _iter_files(root: str):
+    """
+    Yields file paths below root via an os.scandir DFS. DirEntry caches
+    the stat result, so this costs one syscall per entry instead of the
+    double stat + full-list materialization of glob('**').
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path
+        except OSError as e:
+            logger.warning(f"Could not scan {current}: {e}")
+
+def _hash_bytes(data) -> str:
+    # Dedup keys don't need a cryptographic hash: xxh3 is the fastest
+    # option, blake3 the next, MD5 the portable fallback.
+    if xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(data)
+    if blake3 is not None:
+        return blake3.blake3(data).hexdigest()
+    return hashlib.md5(data).hexdigest()
+
+@lru_cache(maxsize=4096)
+def _hash_text(content: str) -> str:
+    """
+    Memoized content hash: the splitter and re-runs hash identical
+    strings repeatedly, and a dict hit beats rehashing megabytes.
+    """
+    return _hash_bytes(content.encode('utf-8', errors='ignore'))
+
+def _image_data_url(name: str, data: bytes) -> str:
+    """
+    Builds the data URL for a Vision payload. Encoding through a
+    memoryview avoids copying the buffer first, and the MIME type comes
+    from the extension instead of being hardcoded to jpeg (saves the
+    provider a re-decode on mislabeled content).
+    """
+    mime = IMAGE_MIME_TYPES.get(os.path.splitext(name)[1].lower(), "image/jpeg")
+    b64 = base64.b64encode(memoryview(data)).decode('ascii')
+    return f"data:{mime};base64,{b64}"
+
+# Images described per Vision request: amortizes the HTTP round-trip
+# without making any single response unreasonably long.
+VISION_BATCH_SIZE = 4
+
+# Near-duplicate rejection: docs whose shingle sets overlap this much
+# (estimated Jaccard) are treated as copies of already-seen content.
+MINHASH_PERMS = 128
+NEAR_DUP_THRESHOLD = 0.9
+
+# Small-to-big chunking: compact children are embedded and searched,
+# their parent chunks are what gets handed to the LLM.
+CHILD_CHUNK_SIZE = 300
+CHILD_CHUNK_OVERLAP = 50
+
+class FastSplitter:
+    """
+    Single-pass regex chunker replacing RecursiveCharacterTextSplitter.
+    One precompiled pattern scans the text in C instead of repeated
+    Python-level find/split passes per separator. Chunks prefer to end
+    on a paragraph, newline or space boundary (mirroring the LangChain
+    separator hierarchy) and carry a leading character overlap.
+    """
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # First alternative breaks on a separator within chunk_size chars;
+        # the second handles separator-free runs by hard-cutting.
+        self._pattern = re.compile(
+            r".{1,%d}(?:\n\n|\n| |$)|.{1,%d}" % (chunk_size, chunk_size),
+            re.DOTALL
+        )
+
+    def split_text(self, text: str) -> List[str]:
+        chunks = []
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            if chunks:
+                start = max(0, start - self.chunk_overlap)
+            chunk = text[start:match.end()].strip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunked = []
+        for doc in documents:
+            for chunk in self.split_text(doc.page_content):
+                chunked.append(Document(page_content=chunk, metadata=dict(doc.metadata)))
+        return chunked
+
+class RustSplitter:
+    """
+    Adapter around the Rust text-splitter bindings
+    (semantic-text-splitter): the same recursive splitting as
+    FastSplitter but with native UTF-8 scanning and zero-copy slicing,
+    which is markedly faster on multi-MB markdown.
+    """
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._splitter = RustTextSplitter(capacity=chunk_size, overlap=chunk_overlap)
+
+    def split_text(self, text: str) -> List[str]:
+        return list(self._splitter.chunks(text))
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunked = []
+        for doc in documents:
+            for chunk in self.split_text(doc.page_content):
+                chunked.append(Document(page_content=chunk, metadata=dict(doc.metadata)))
+        return chunked
+
 class IngestionEngine:
     def __init__(self, chunk_size=1000, chunk_overlap=200, vision_model="meta-llama/llama-4-maverick-17b-128e-instruct"):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.vision_model = vision_model
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        splitter_cls = RustSplitter if RustTextSplitter is not None else FastSplitter
+        self.parent_splitter = splitter_cls(
             chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            separators=["\n\n", "\n", " ", ""]
+            chunk_overlap=0
+        )
+        self.child_splitter = splitter_cls(
+            chunk_size=CHILD_CHUNK_SIZE,
+            chunk_overlap=CHILD_CHUNK_OVERLAP
         )
+
+        # Parents produced by the last process_* run, keyed by parent_id;
+        # the caller persists these alongside the child chunks.
+        self.parent_documents: dict = {}
         
-        # Groq Client for Vision
+        # File-level hashes whose chunks became stale on the last
+        # incremental process_folder run.
+        self.stale_file_hashes: List[str] = []
+
+        # Manifest prepared by the last process_* run, persisted only
+        # when the caller confirms the vector-store writes succeeded.
+        self._pending_manifest: Optional[Tuple[Optional[str], dict]] = None
+
+        # MinHash LSH index for near-duplicate rejection (exact dedup
+        # misses re-exports of the same document with trivial diffs).
+        # Rebuilt per run: a process-lifetime index would reject the new
+        # version of an edited file whose old chunks the same run just
+        # evicted, silently losing the document until restart.
+        self._lsh = self._new_lsh()
+        if self._lsh is None:
+            logger.warning("datasketch not installed. Near-duplicate rejection disabled.")
+
+        # Groq Client for Vision. The client's pooled HTTP transport is
+        # shared by all ingestion threads, so concurrent requests reuse
+        # warm connections; the semaphore bounds how many hit the Vision
+        # API at once (rate-limit friendly).
+        self._vision_semaphore = threading.Semaphore(8)
         if not GROQ_API_KEY:
             logger.warning("GROQ_API_KEY not found. Vision capabilities will be disabled.")
             self.groq_client = None
         else:
             self.groq_client = Groq(api_key=GROQ_API_KEY)
 
-    def process_folder(self, folder_path: str) -> List[Document]:
+    def process_folder(self, folder_path: str, manifest_path: Optional[str] = None) -> List[Document]:
         """
-        Iterates through a folder and processes files (PDF, Images, Text, Word)
+        Iterates through a folder and processes files (PDF, Images, Text, Word).
+        With a manifest_path, ingestion is incremental: files whose content
+        hash matches the previous run are skipped, and hashes of changed or
+        removed files are exposed via self.stale_file_hashes so the caller
+        can evict their chunks from the vector store. The updated manifest
+        is persisted by calling save_manifest() once the chunks are safely
+        stored.
         """
         documents = []
+        self.stale_file_hashes = []
+        self.parent_documents = {}
+        self._lsh = self._new_lsh()
         # Ensure folder exists
         if not os.path.exists(folder_path):
              logger.warning(f"Folder {folder_path} does not exist.")
              return []
 
-        files = glob.glob(os.path.join(folder_path, "**", "*.*"), recursive=True)
-        
+        files = list(_iter_files(folder_path))
+
         logger.info(f"Found {len(files)} files in {folder_path}")
-        
-        for file_path in files:
-            ext = os.path.splitext(file_path)[1].lower()
-            try:
-                raw_docs = []
-                if ext == ".pdf":
-                    raw_docs = self._process_pdf(file_path)
-                elif ext in [".docx", ".doc"]:
-                    raw_docs = self._process_docx(file_path)
-                elif ext in [".md", ".txt", ".yaml", ".yml", ".json", ".csv", ".log"]:
-                    raw_docs = self._process_text(file_path)
-                elif ext in [".png", ".jpg", ".jpeg", ".tiff", ".bmp"]:
-                    raw_docs = self._process_image(file_path)
-                
-                # Deduplication Hash
-                for doc in raw_docs:
-                    doc.metadata["file_hash"] = self._compute_hash(doc.page_content)
-                    documents.append(doc)
-
-            except Exception as e:
-                logger.error(f"Failed to process {file_path}: {e}")
-        
-        # Chunking
+
+        old_manifest = self._load_manifest(manifest_path)
+        new_manifest = {}
+        file_hashes = {path: self._hash_file(path) for path in files}
+        # Manifest keys are paths relative to the ingest root: basenames
+        # would collide for same-named files in different subfolders.
+        manifest_keys = {path: os.path.relpath(path, folder_path) for path in files}
+
+        unchanged = [p for p in files if old_manifest.get(manifest_keys[p]) == file_hashes[p]]
+        to_process = [p for p in files if p not in unchanged]
+        for path in unchanged:
+            new_manifest[manifest_keys[path]] = file_hashes[path]
+        if unchanged:
+            logger.info(f"Skipping {len(unchanged)} unchanged files.")
+
+        # Images are grouped into batched Vision calls; everything else
+        # gets one task per file.
+        image_paths = [p for p in to_process if os.path.splitext(p)[1].lower() in IMAGE_EXTS]
+        other_paths = [p for p in to_process if p not in image_paths]
+
+        # Files are I/O-and-subprocess bound (PDF parsing, Vision HTTP calls),
+        # so threads overlap their latencies instead of paying them serially.
+        max_workers = min(8, (os.cpu_count() or 1) * 2)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._process_one, path, file_hashes[path]): [path]
+                for path in other_paths
+            }
+            for i in range(0, len(image_paths), VISION_BATCH_SIZE):
+                batch_paths = image_paths[i:i + VISION_BATCH_SIZE]
+                items = []
+                for path in batch_paths:
+                    with open(path, 'rb') as f:
+                        items.append((os.path.basename(path), f.read()))
+                future = executor.submit(
+                    self._process_image_items, items,
+                    {os.path.basename(p): file_hashes[p] for p in batch_paths}
+                )
+                futures[future] = batch_paths
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    documents.extend(future.result())
+                    for path in batch:
+                        new_manifest[manifest_keys[path]] = file_hashes[path]
+                except Exception as e:
+                    logger.error(f"Failed to process {batch}: {e}")
+                    # Carry the old manifest entry forward for failed
+                    # files: nothing replaced their chunks, so their old
+                    # hash must not be marked stale and evicted. The new
+                    # version is retried on the next run.
+                    for path in batch:
+                        key = manifest_keys[path]
+                        if key in old_manifest:
+                            new_manifest[key] = old_manifest[key]
+
+        # Hashes that were in the old manifest but no longer correspond to a
+        # current file version: their chunks are stale in the vector store.
+        current = set(new_manifest.values())
+        self.stale_file_hashes = [h for h in old_manifest.values() if h not in current]
+        # Held back until save_manifest(): writing it now would mark the
+        # files ingested even if the vector-store write still fails.
+        self._pending_manifest = (manifest_path, new_manifest)
+
+        return self._chunk(documents)
+
+    def save_manifest(self):
+        """
+        Persists the manifest prepared by the last process_* run. Called
+        by the caller after the vector store accepted the new chunks;
+        saving earlier would record files as ingested when the store
+        write failed, and they would then be skipped as unchanged on
+        every later run with their chunks silently missing.
+        """
+        if self._pending_manifest is None:
+            return
+        manifest_path, manifest = self._pending_manifest
+        self._save_manifest(manifest_path, manifest)
+        self._pending_manifest = None
+
+    def process_uploads(self, items: List[Tuple[str, bytes]], manifest_path: Optional[str] = None) -> List[Document]:
+        """
+        Processes in-memory uploads as (filename, bytes) pairs, skipping
+        the disk round-trip entirely. Incremental semantics match
+        process_folder: unchanged uploads are skipped by content hash and
+        stale hashes are exposed via self.stale_file_hashes.
+        """
+        documents = []
+        self.stale_file_hashes = []
+        self.parent_documents = {}
+        self._lsh = self._new_lsh()
+
+        logger.info(f"Processing {len(items)} uploaded files.")
+
+        old_manifest = self._load_manifest(manifest_path)
+        new_manifest = {}
+        hashes = {name: _hash_bytes(data) for name, data in items}
+
+        to_process = []
+        for name, data in items:
+            if old_manifest.get(name) == hashes[name]:
+                new_manifest[name] = hashes[name]
+            else:
+                to_process.append((name, data))
+        if len(items) > len(to_process):
+            logger.info(f"Skipping {len(items) - len(to_process)} unchanged files.")
+
+        image_items = [(n, d) for n, d in to_process if os.path.splitext(n)[1].lower() in IMAGE_EXTS]
+        other_items = [(n, d) for n, d in to_process if os.path.splitext(n)[1].lower() not in IMAGE_EXTS]
+
+        max_workers = min(8, (os.cpu_count() or 1) * 2)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._process_bytes, name, data, hashes[name]): [name]
+                for name, data in other_items
+            }
+            for i in range(0, len(image_items), VISION_BATCH_SIZE):
+                batch = image_items[i:i + VISION_BATCH_SIZE]
+                future = executor.submit(
+                    self._process_image_items, batch,
+                    {name: hashes[name] for name, _ in batch}
+                )
+                futures[future] = [name for name, _ in batch]
+            for future in as_completed(futures):
+                names = futures[future]
+                try:
+                    documents.extend(future.result())
+                    for name in names:
+                        new_manifest[name] = hashes[name]
+                except Exception as e:
+                    logger.error(f"Failed to process {names}: {e}")
+                    # Same as process_folder: keep the old entry so a
+                    # transient failure does not evict good chunks.
+                    for name in names:
+                        if name in old_manifest:
+                            new_manifest[name] = old_manifest[name]
+
+        current = set(new_manifest.values())
+        self.stale_file_hashes = [h for h in old_manifest.values() if h not in current]
+        self._pending_manifest = (manifest_path, new_manifest)
+
+        return self._chunk(documents)
+
+    def _chunk(self, documents: List[Document]) -> List[Document]:
         if not documents:
             return []
-            
-        chunked_docs = self.text_splitter.split_documents(documents)
-        logger.info(f"Generated {len(chunked_docs)} chunks from {len(documents)} source docs.")
-        return chunked_docs
 
-    def _process_image(self, file_path: str) -> List[Document]:
+        # Exact dedup before chunking: identical docs (e.g. the same PDF
+        # uploaded twice under different names) are split and embedded once.
+        seen_hashes = set()
+        unique_docs = []
+        for doc in documents:
+            content_hash = doc.metadata.get("file_hash") or _hash_text(doc.page_content)
+            if content_hash in seen_hashes:
+                continue
+            seen_hashes.add(content_hash)
+            unique_docs.append(doc)
+        if len(unique_docs) < len(documents):
+            logger.info(f"Dropped {len(documents) - len(unique_docs)} duplicate source docs.")
+
+        unique_docs = self._reject_near_duplicates(unique_docs)
+
+        # Small-to-big hierarchy: parents are the retrieval unit handed to
+        # the LLM, children are what actually gets embedded and searched.
+        parents = self.parent_splitter.split_documents(unique_docs)
+        children = []
+        for parent in parents:
+            parent_id = str(uuid.uuid4())
+            parent.metadata["parent_id"] = parent_id
+            self.parent_documents[parent_id] = parent
+            children.extend(self.child_splitter.split_documents([parent]))
+
+        logger.info(
+            f"Generated {len(children)} child chunks under {len(parents)} parents "
+            f"from {len(unique_docs)} source docs."
+        )
+        return children
+
+    @staticmethod
+    def _new_lsh():
+        if MinHashLSH is None:
+            return None
+        return MinHashLSH(threshold=NEAR_DUP_THRESHOLD, num_perm=MINHASH_PERMS)
+
+    def _reject_near_duplicates(self, documents: List[Document]) -> List[Document]:
+        """
+        Drops docs that are near-duplicates of content already seen this
+        run (MinHash over whitespace shingles, LSH lookup). Skipped copies
+        never reach the splitter or the embedding model. The index is
+        scoped to a single run: cross-run duplicates are handled by the
+        manifest and stale-hash eviction instead.
+        """
+        if self._lsh is None or not documents:
+            return documents
+
+        kept = []
+        for doc in documents:
+            minhash = MinHash(num_perm=MINHASH_PERMS)
+            for token in doc.page_content.split():
+                minhash.update(token.encode('utf-8'))
+
+            if self._lsh.query(minhash):
+                logger.info(f"Dropping near-duplicate doc from {doc.metadata.get('source', 'unknown')}.")
+                continue
+
+            try:
+                self._lsh.insert(doc.metadata.get("file_hash", str(id(doc))), minhash)
+            except ValueError:
+                # Duplicate insert key (exact dedup should prevent this);
+                # keep the doc rather than silently dropping it.
+                logger.warning(f"Duplicate LSH key for {doc.metadata.get('source', 'unknown')}; keeping doc.")
+            kept.append(doc)
+        return kept
+
+    def _process_one(self, file_path: str, source_file_hash: Optional[str] = None) -> List[Document]:
+        """
+        Reads a file from disk and feeds it through the byte-level loaders.
+        """
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        return self._process_bytes(os.path.basename(file_path), data, source_file_hash)
+
+    def _process_bytes(self, name: str, data: bytes, source_file_hash: Optional[str] = None) -> List[Document]:
+        """
+        Dispatches in-memory file content to the right loader and attaches
+        the deduplication hashes. Runs inside the ingestion thread pool.
+        """
+        ext = os.path.splitext(name)[1].lower()
+        raw_docs = []
+        if ext == ".pdf":
+            raw_docs = self._process_pdf(name, data)
+        elif ext in [".docx", ".doc"]:
+            raw_docs = self._process_docx(name, data)
+        elif ext in [".md", ".txt", ".yaml", ".yml", ".json", ".csv", ".log"]:
+            raw_docs = self._process_text(name, data)
+        elif ext in [".png", ".jpg", ".jpeg", ".tiff", ".bmp"]:
+            raw_docs = self._process_image(name, data)
+
+        for doc in raw_docs:
+            doc.metadata["file_hash"] = self._compute_hash(doc.page_content)
+            if source_file_hash:
+                doc.metadata["source_file_hash"] = source_file_hash
+        return raw_docs
+
+    def _hash_file(self, file_path: str) -> str:
+        """
+        Hashes the raw file bytes (used for incremental-ingest skipping).
+        With a SIMD hash available the file is mmap'd and hashed by the
+        native backend without copying it into Python; blake3's rayon
+        mode additionally fans the mmap across cores, saturating memory
+        bandwidth on large files. Must stay consistent with _hash_bytes:
+        folder and upload ingests share the same manifest, which is why
+        rayon is only used when blake3 is the backend _hash_bytes picks.
+        """
+        if xxhash is None and blake3 is not None:
+            hasher = blake3.blake3()
+            update_mmap = getattr(hasher, "update_mmap_rayon", None) or getattr(hasher, "update_mmap", None)
+            if update_mmap is not None:
+                try:
+                    update_mmap(file_path)
+                    return hasher.hexdigest()
+                except OSError as e:
+                    logger.warning(f"mmap hashing failed for {file_path}: {e}")
+
+        with open(file_path, 'rb') as f:
+            if xxhash is not None or blake3 is not None:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        return _hash_bytes(mm)
+                except ValueError:
+                    # Empty files cannot be mmap'd
+                    return _hash_bytes(f.read())
+
+            hasher = hashlib.md5()
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+
+    def _load_manifest(self, manifest_path: Optional[str]) -> dict:
+        if not manifest_path or not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read manifest {manifest_path}: {e}")
+            return {}
+
+    def _save_manifest(self, manifest_path: Optional[str], manifest: dict):
+        if not manifest_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+        except Exception as e:
+            logger.warning(f"Could not write manifest {manifest_path}: {e}")
+
+    def _process_image_items(self, items: List[Tuple[str, bytes]], source_hashes: dict) -> List[Document]:
+        """
+        Batch wrapper used by the ingestion pool: describes a group of
+        images in one Vision call and attaches the dedup hashes.
+        """
+        docs = self._process_image_batch(items)
+        for doc in docs:
+            doc.metadata["file_hash"] = self._compute_hash(doc.page_content)
+            source_hash = source_hashes.get(doc.metadata.get("source"))
+            if source_hash:
+                doc.metadata["source_file_hash"] = source_hash
+        return docs
+
+    def _process_image_batch(self, items: List[Tuple[str, bytes]]) -> List[Document]:
+        """
+        Describes up to VISION_BATCH_SIZE images in a single Groq Vision
+        request: one text prompt asking for a numbered paragraph per
+        image, split back out on the [IMG i] markers. Amortizes the HTTP
+        round-trip across the batch; falls back to one call per image if
+        the batched response cannot be split.
+        """
+        if not self.groq_client:
+            logger.warning(f"Skipping {len(items)} images - No Groq Client")
+            return []
+        if len(items) == 1:
+            return self._process_image(*items[0])
+
+        try:
+            content = [{
+                "type": "text",
+                "text": (
+                    f"You are given {len(items)} UI screenshots or diagrams. For each image i, "
+                    "in order, return one paragraph prefixed with '[IMG i]:' describing it in "
+                    "technical detail for a QA engineer. List all visible buttons, fields, "
+                    "error messages, and layout elements."
+                )
+            }]
+            for name, data in items:
+                content.append({
+                    "type": "image_url",
+                    "image_url": {"url": _image_data_url(name, data)}
+                })
+
+            with self._vision_semaphore:
+                completion = self.groq_client.chat.completions.create(
+                    model=self.vision_model,
+                    messages=[{"role": "user", "content": content}],
+                    temperature=0.1,
+                    max_tokens=1024 * len(items),
+                )
+            response = completion.choices[0].message.content
+
+            # re.split with a capture group yields [prefix, i, text, i, text, ...]
+            parts = re.split(r'\[IMG\s*(\d+)\]\s*:?', response)
+            descriptions = {int(i): text.strip() for i, text in zip(parts[1::2], parts[2::2])}
+
+            docs = []
+            for i, (name, data) in enumerate(items, start=1):
+                description = descriptions.get(i)
+                if not description:
+                    logger.warning(f"No batched description for {name}. Retrying individually.")
+                    docs.extend(self._process_image(name, data))
+                    continue
+                docs.append(Document(
+                    page_content=f"[IMAGE SOURCE: {name}]\nDescription: {description}",
+                    metadata={"source": name, "page": 1, "type": "image"}
+                ))
+            return docs
+
+        except Exception as e:
+            logger.error(f"Batched Vision call failed: {e}. Falling back to per-image calls.")
+            docs = []
+            for name, data in items:
+                docs.extend(self._process_image(name, data))
+            return docs
+
+    def _process_image(self, name: str, data: bytes) -> List[Document]:
         """
         Sends image to Groq Vision model for description.
         """
         if not self.groq_client:
-            logger.warning(f"Skipping image {file_path} - No Groq Client")
+            logger.warning(f"Skipping image {name} - No Groq Client")
             return []
 
         try:
-            # Encode image
-            with open(file_path, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-
-            completion = self.groq_client.chat.completions.create(
-                model=self.vision_model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text", 
-                                "text": "Describe this UI screenshot or diagram in technical detail for a QA engineer. List all visible buttons, fields, error messages, and layout elements."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
+            with self._vision_semaphore:
+                completion = self.groq_client.chat.completions.create(
+                    model=self.vision_model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": "Describe this UI screenshot or diagram in technical detail for a QA engineer. List all visible buttons, fields, error messages, and layout elements."
+                                },
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": _image_data_url(name, data)
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                temperature=0.1,
-                max_tokens=1024,
-            )
+                            ]
+                        }
+                    ],
+                    temperature=0.1,
+                    max_tokens=1024,
+                )
             
             description = completion.choices[0].message.content
-            content = f"[IMAGE SOURCE: {os.path.basename(file_path)}]\nDescription: {description}"
-            
+            content = f"[IMAGE SOURCE: {name}]\nDescription: {description}"
+
             return [Document(
                 page_content=content,
-                metadata={"source": os.path.basename(file_path), "page": 1, "type": "image"}
+                metadata={"source": name, "page": 1, "type": "image"}
             )]
 
         except Exception as e:
-            logger.error(f"Vision API handling failed for {file_path}: {e}")
+            logger.error(f"Vision API handling failed for {name}: {e}")
             return []
 
-    def _process_pdf(self, file_path: str) -> List[Document]:
+    # Pages handled per worker thread when extracting PDF text in parallel.
+    PDF_PAGES_PER_WORKER = 16
+
+    def _process_pdf(self, name: str, data: bytes) -> List[Document]:
         """
-        Uses pymupdf4llm to convert PDF to Markdown. 
+        Extracts PDF text page by page with fitz (PyMuPDF).
+        Large PDFs are split into page ranges extracted in parallel; fitz
+        documents are not thread-safe, so each worker opens its own handle
+        over the shared bytes (cheap — no copy of the raw data), while the
+        actual page parsing releases the GIL and scales across cores.
+        Falls back to OCR for scanned PDFs with no extractable text.
         """
         try:
-            md_text = pymupdf4llm.to_markdown(file_path)
-            return [Document(
-                page_content=md_text,
-                metadata={"source": os.path.basename(file_path), "page": 0, "type": "pdf_markdown"}
-            )]
+            with fitz.open(stream=data, filetype="pdf") as probe:
+                page_count = probe.page_count
+
+            def extract_range(start: int, end: int) -> List[Tuple[int, str]]:
+                with fitz.open(stream=data, filetype="pdf") as pdf:
+                    return [
+                        (i, pdf[i].get_text("text", sort=True))
+                        for i in range(start, end)
+                    ]
+
+            ranges = [
+                (start, min(start + self.PDF_PAGES_PER_WORKER, page_count))
+                for start in range(0, page_count, self.PDF_PAGES_PER_WORKER)
+            ]
+            if len(ranges) > 1:
+                with ThreadPoolExecutor(max_workers=min(len(ranges), os.cpu_count() or 1)) as executor:
+                    results = list(executor.map(lambda r: extract_range(*r), ranges))
+                pages = [page for chunk in results for page in chunk]
+            else:
+                pages = extract_range(0, page_count)
+
+            total_text_len = sum(len(text) for _, text in pages)
+            if total_text_len < 50:
+                logger.info(f"No extractable text in {name}, trying OCR fallback.")
+                return self._pdf_ocr_fallback(name, data)
+
+            return [
+                Document(
+                    page_content=text,
+                    metadata={"source": name, "page": i + 1, "type": "pdf_text"}
+                )
+                for i, text in pages if text.strip()
+            ]
         except Exception as e:
-            logger.error(f"PDF processing failed for {file_path}: {e}")
+            logger.error(f"PDF processing failed for {name}: {e}")
             return []
 
-    def _process_text(self, file_path: str) -> List[Document]:
+    def _pdf_ocr_fallback(self, name: str, data: bytes) -> List[Document]:
         """
-        Tries multiple encodings.
+        OCRs a scanned PDF page by page. Each Tesseract call is a separate
+        subprocess, so pages are OCR'd in parallel across a thread pool.
+        """
+        try:
+            from pdf2image import convert_from_bytes
+            import pytesseract
+        except ImportError:
+            logger.warning(f"pdf2image/pytesseract not installed. Skipping OCR for {name}.")
+            return []
+
+        try:
+            pages = convert_from_bytes(data, dpi=200, thread_count=os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+                texts = list(executor.map(
+                    lambda page: pytesseract.image_to_string(page, config="--oem 1 --psm 6"),
+                    pages
+                ))
+
+            # One Document per page, mirroring the fitz path: keeps page
+            # numbers accurate for citations and hands the splitter
+            # page-sized strings instead of one monster doc.
+            return [
+                Document(
+                    page_content=text,
+                    metadata={"source": name, "page": i + 1, "type": "pdf_ocr"}
+                )
+                for i, text in enumerate(texts) if text.strip()
+            ]
+        except Exception as e:
+            logger.error(f"OCR fallback failed for {name}: {e}")
+            return []
+
+    def _process_text(self, name: str, data: bytes) -> List[Document]:
+        """
+        Decodes text content. Sniffs the encoding once from the first
+        64KB (when chardet is installed) so the common case is a single
+        decode; only on a wrong guess does it fall through the usual
+        encoding list.
         """
         encodings = ['utf-8', 'latin-1', 'cp1252']
+        if chardet is not None:
+            detected = chardet.detect(data[:65536]).get("encoding")
+            if detected and detected.lower() not in encodings:
+                encodings.insert(0, detected.lower())
+            elif detected:
+                encodings.insert(0, encodings.pop(encodings.index(detected.lower())))
+
         for enc in encodings:
             try:
-                loader = TextLoader(file_path, encoding=enc)
-                return loader.load()
-            except Exception:
+                text = data.decode(enc)
+                return [Document(page_content=text, metadata={"source": name})]
+            except (UnicodeDecodeError, LookupError):
                 continue
-        
-        logger.error(f"Could not decode text file {file_path} with supported encodings.")
+
+        logger.error(f"Could not decode text file {name} with supported encodings.")
         return []
 
-    def _process_docx(self, file_path: str) -> List[Document]:
+    def _process_docx(self, name: str, data: bytes) -> List[Document]:
         """
         Processes Word Documents (.docx).
         """
         try:
-            if file_path.endswith(".docx"):
-                loader = Docx2txtLoader(file_path)
-                return loader.load()
-            
-            # Fallback for .doc
-            loader = UnstructuredWordDocumentLoader(file_path)
-            return loader.load()
+            if name.endswith(".docx"):
+                text = docx2txt.process(io.BytesIO(data))
+                return [Document(page_content=text, metadata={"source": name})]
+
+            # Fallback for .doc (unstructured needs a real path)
+            with tempfile.NamedTemporaryFile(suffix=".doc", delete=False) as tmp:
+                tmp.write(data)
+                tmp_path = tmp.name
+            try:
+                loader = UnstructuredWordDocumentLoader(tmp_path)
+                docs = loader.load()
+                for doc in docs:
+                    doc.metadata["source"] = name
+                return docs
+            finally:
+                os.unlink(tmp_path)
         except Exception as e:
-            logger.error(f"Error reading Word Doc {file_path}: {e}")
+            logger.error(f"Error reading Word Doc {name}: {e}")
             return []
 
     def _compute_hash(self, content: str) -> str:
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+        return _hash_text(content)
@@ -1,76 +1,383 @@
+import logging
 import os
 import sys
-from typing import List
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
+from sentence_transformers import SentenceTransformer
 
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.logger import setup_logger
-from core.config import EMBEDDING_MODEL_NAME
+from core.config import EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND
+from core.embed_cache import EmbedCache
+from core.parent_store import ParentStore
 
 logger = setup_logger()
 
+def _pick_device() -> str:
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "cuda"
+    except ImportError:
+        pass
+    return "cpu"
+
+EMBED_DEVICE = _pick_device()
+# Larger batches pay off on GPU, where encode() cost is dominated by
+# kernel-launch overhead rather than compute per chunk.
+EMBED_BATCH_SIZE = 128 if EMBED_DEVICE == "cuda" else 64
+
+# Chroma rejects very large single inserts; stay under its batch limit.
+CHROMA_INSERT_BATCH = 5000
+
+# HNSW tuning: cosine space matches the normalized MiniLM vectors (and is
+# cheaper than L2 — no sqrt), larger M/ef trade index build time for recall.
+HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 80,
+}
+
+# Semantic query cache: queries this close (cosine) reuse cached results.
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_SIM_THRESHOLD = 0.97
+
+# Exact-match LRU for query embeddings: re-running the same query string
+# (users iterating on a prompt) skips the model forward pass entirely.
+QUERY_EMBED_CACHE_SIZE = 1024
+
+@lru_cache(maxsize=1)
+def _load_st_model(model_name: str) -> SentenceTransformer:
+    """
+    Loads the embedding model once per process. Multiple RetrievalEngine
+    instances share the same transformer instead of re-reading the
+    weights from disk. On CPU the configured backend (ONNX Runtime) is
+    preferred, falling back to PyTorch if its extras are unavailable.
+    On a CUDA machine the torch path wins outright — the exported ONNX
+    model runs on CPU execution providers, while torch in fp16 gets
+    half the memory traffic and tensor-core throughput for MiniLM's
+    matmuls.
+    """
+    if EMBEDDING_BACKEND != "torch" and EMBED_DEVICE != "cuda":
+        try:
+            return SentenceTransformer(model_name, backend=EMBEDDING_BACKEND)
+        except Exception as e:
+            logger.warning(
+                f"Could not load embedding model with '{EMBEDDING_BACKEND}' backend ({e}). "
+                f"Falling back to torch."
+            )
+    model = SentenceTransformer(model_name, device=EMBED_DEVICE)
+    if EMBED_DEVICE == "cuda":
+        model.half()
+    return model
+
+class SentenceTransformerEmbeddings:
+    """
+    Thin adapter so Chroma can still embed queries while we control
+    document embedding ourselves (batched) in add_documents.
+    """
+    def __init__(self, model: SentenceTransformer):
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=EMBED_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return embeddings.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
 class RetrievalEngine:
-    def __init__(self, persist_directory: str = "chroma_db"):
+    def __init__(self, persist_directory: str = "chroma_db", client=None):
+        """
+        An injected chromadb client (e.g. one PersistentClient shared for
+        the process lifetime) avoids re-opening the DB per instance.
+        """
         self.persist_directory = persist_directory
-        self.embedding_function = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
-        
-        self.vector_store = Chroma(
+        self.client = client
+        self.st_model = _load_st_model(EMBEDDING_MODEL_NAME)
+        self.embedding_function = SentenceTransformerEmbeddings(self.st_model)
+
+        self.vector_store = self._make_store()
+        self._ensure_cosine_space()
+
+        self.embed_cache = EmbedCache(
+            cache_path=os.path.join(self.persist_directory, "embed_cache.sqlite3")
+        )
+        self.parent_store = ParentStore(
+            store_path=os.path.join(self.persist_directory, "parent_store.sqlite3")
+        )
+
+        # Semantic query cache (query vector -> retrieved docs). Vectors
+        # are held in fp16: cosine probes are insensitive to the precision
+        # loss and the matrix takes half the memory bandwidth to scan.
+        self._q_cache_vecs = np.empty((0, self.st_model.get_sentence_embedding_dimension()), dtype=np.float16)
+        self._q_cache_docs: List[List[Document]] = []
+
+        # Exact-match query embedding LRU (query string -> vector).
+        self._q_embed_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def _make_store(self) -> Chroma:
+        if self.client is not None:
+            return Chroma(
+                collection_name="rag_collection",
+                embedding_function=self.embedding_function,
+                client=self.client,
+                collection_metadata=HNSW_METADATA
+            )
+        return Chroma(
             collection_name="rag_collection",
             embedding_function=self.embedding_function,
-            persist_directory=self.persist_directory
+            persist_directory=self.persist_directory,
+            collection_metadata=HNSW_METADATA
         )
 
-    def add_documents(self, documents: List[Document]):
+    def _ensure_cosine_space(self):
+        """
+        collection_metadata only applies at collection creation, so a
+        collection persisted before the cosine switch still measures L2
+        distances — where the 0.5 cosine threshold silently rejects
+        everything. Detect that on startup and rebuild the collection;
+        its content must be re-ingested.
+        """
+        try:
+            metadata = self.vector_store._collection.metadata or {}
+            if metadata.get("hnsw:space") != "cosine":
+                logger.warning(
+                    "Existing collection does not use cosine distance; "
+                    "recreating it. Re-ingest your documents."
+                )
+                self.vector_store.delete_collection()
+                self.vector_store = self._make_store()
+        except Exception as e:
+            logger.error(f"Could not verify collection distance space: {e}")
+
+    def add_documents(self, documents: List[Document], parents: Optional[dict] = None):
         """
         Adds documents to the vector store.
+        Embeds all texts in one batched encode() call instead of letting
+        Chroma push them through the embedding function one by one.
+        Vectors for previously seen chunks come from the persistent
+        embedding cache, so re-ingesting unchanged content skips the model.
+        With parent-child chunking, `parents` maps parent_id to the parent
+        Document; only the (smaller) children are embedded.
         """
+        if parents:
+            self.parent_store.put_many(parents)
         if not documents:
             return
-        
-        self.vector_store.add_documents(documents)
-        logger.info(f"Added {len(documents)} documents to vector store.")
-
-    def query(self, query_text: str, top_k: int = 5, score_threshold: float = 1.2) -> List[Document]:
-        """
-        Retrieves relevant documents. 
-        Note: For L2 distance (default in Chroma), LOWER is better.
-        The score is a distance. 
-        """
-        results_with_scores = self.vector_store.similarity_search_with_score(query_text, k=top_k)
-        
-        valid_docs = []
-        for doc, score in results_with_scores:
-            logger.info(f"Retrieved doc '{doc.metadata.get('source', 'unknown')}' with distance: {score}")
-            
-            # Distance threshold: If distance is too high (poor match), filter it.
-            # all-MiniLM-L6-v2 distances usually range 0-2. 0 is exact.
-            if score < score_threshold: 
-               valid_docs.append(doc)
-            else:
-                logger.warning(f"Filtered out doc due to low confidence (high distance): {score}")
+
+        texts = [doc.page_content for doc in documents]
+        keys = [EmbedCache.make_key(EMBEDDING_MODEL_NAME, text) for text in texts]
+        cached = self.embed_cache.get_many(keys)
+
+        miss_indices = [i for i, key in enumerate(keys) if key not in cached]
+        if miss_indices:
+            miss_embeddings = self.st_model.encode(
+                [texts[i] for i in miss_indices],
+                batch_size=EMBED_BATCH_SIZE,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+            new_items = {keys[i]: vec for i, vec in zip(miss_indices, miss_embeddings)}
+            self.embed_cache.put_many(new_items)
+            cached.update(new_items)
+
+        embeddings = [cached[key].tolist() for key in keys]
+        # Ids are source-file hash + content hash: content-hashing keeps
+        # re-adds idempotent (an unchanged chunk upserts its own row
+        # instead of duplicating under a fresh UUID), while the file
+        # prefix keeps identical text appearing in two files as two rows,
+        # so per-file eviction and source attribution stay correct.
+        # Identical text repeated inside one file (headers, boilerplate)
+        # yields the same id; Chroma rejects duplicate ids within a
+        # single upsert call, so those collapse to one row here.
+        rows = {}
+        for doc, key, embedding in zip(documents, keys, embeddings):
+            doc_id = f"{doc.metadata.get('source_file_hash', '')}:{key.hex()}"
+            rows.setdefault(doc_id, (embedding, doc.page_content, doc.metadata))
+        ids = list(rows.keys())
+        row_values = list(rows.values())
+
+        for start in range(0, len(ids), CHROMA_INSERT_BATCH):
+            end = start + CHROMA_INSERT_BATCH
+            batch = row_values[start:end]
+            self.vector_store._collection.upsert(
+                ids=ids[start:end],
+                embeddings=[r[0] for r in batch],
+                documents=[r[1] for r in batch],
+                metadatas=[r[2] for r in batch]
+            )
+        self._invalidate_query_cache()
+        logger.info(
+            f"Added {len(documents)} documents to vector store "
+            f"({len(miss_indices)} embedded, {len(documents) - len(miss_indices)} from cache)."
+        )
+
+    def query(self, query_text: str, top_k: int = 5, score_threshold: float = 0.5) -> List[Document]:
+        """
+        Retrieves relevant documents.
+        Note: scores are cosine distances (1 - cosine similarity), so
+        LOWER is better: 0 is identical, 1 is orthogonal.
+        Near-duplicate queries are served from the semantic cache: one
+        dot product against cached query vectors instead of a full
+        embed + index search.
+        """
+        query_vec = self._embed_query(query_text)
+
+        if len(self._q_cache_docs) > 0:
+            sims = self._q_cache_vecs @ query_vec
+            best = int(np.argmax(sims))
+            if sims[best] >= QUERY_CACHE_SIM_THRESHOLD:
+                logger.info(f"Semantic cache hit (similarity {sims[best]:.3f}).")
+                return self._q_cache_docs[best]
+
+        # Reuse the vector computed for the cache check and hit the Chroma
+        # collection directly: skips both the wrapper's re-embedding of the
+        # query text and its per-call dispatch layers.
+        raw = self.vector_store._collection.query(
+            query_embeddings=[query_vec.tolist()],
+            n_results=top_k,
+            include=["documents", "metadatas", "distances"]
+        )
+        docs = [
+            Document(page_content=text, metadata=meta or {})
+            for text, meta in zip(raw["documents"][0], raw["metadatas"][0])
+        ]
+        scores = np.asarray(raw["distances"][0], dtype=np.float32)
+
+        # Distance threshold: If distance is too high (poor match), filter it.
+        # Cosine distance ranges 0-2 for normalized vectors; relevant
+        # matches for all-MiniLM-L6-v2 typically land well below 0.5.
+        # Single vectorized mask instead of a Python-level compare per doc;
+        # per-doc log lines only get formatted when INFO is actually on.
+        mask = scores < score_threshold
+        if logger.isEnabledFor(logging.INFO):
+            for doc, score, keep in zip(docs, scores, mask):
+                if keep:
+                    logger.info(f"Retrieved doc '{doc.metadata.get('source', 'unknown')}' with distance: {score}")
+                else:
+                    logger.info(f"Filtered out doc due to low confidence (high distance): {score}")
+        valid_docs = [doc for doc, keep in zip(docs, mask) if keep]
+
+        valid_docs = self._hydrate_parents(valid_docs)
+        self._cache_query_result(query_vec, valid_docs)
 
         if not valid_docs:
             logger.info("No documents passed the confidence threshold.")
             return []
-            
+
         return valid_docs
 
+    def _embed_query(self, query_text: str) -> np.ndarray:
+        """
+        Embeds a query string, serving exact repeats from a small LRU so
+        iterating on the same prompt costs zero model calls.
+        """
+        cached = self._q_embed_cache.get(query_text)
+        if cached is not None:
+            self._q_embed_cache.move_to_end(query_text)
+            return cached
+
+        query_vec = self.st_model.encode(
+            [query_text], normalize_embeddings=True, convert_to_numpy=True
+        )[0]
+        self._q_embed_cache[query_text] = query_vec
+        if len(self._q_embed_cache) > QUERY_EMBED_CACHE_SIZE:
+            self._q_embed_cache.popitem(last=False)
+        return query_vec
+
+    def _hydrate_parents(self, docs: List[Document]) -> List[Document]:
+        """
+        Small-to-big: children win the similarity search, but the LLM gets
+        their parent chunks. Duplicate parents (several matching children)
+        are returned once, keeping the best rank. Docs without a stored
+        parent pass through unchanged.
+        """
+        parent_ids = [doc.metadata.get("parent_id") for doc in docs]
+        wanted = [pid for pid in parent_ids if pid]
+        if not wanted:
+            return docs
+
+        parents = self.parent_store.get_many(wanted)
+        hydrated = []
+        seen = set()
+        for doc, parent_id in zip(docs, parent_ids):
+            if parent_id and parent_id in parents:
+                if parent_id in seen:
+                    continue
+                seen.add(parent_id)
+                hydrated.append(parents[parent_id])
+            else:
+                hydrated.append(doc)
+        return hydrated
+
+    def _cache_query_result(self, query_vec: np.ndarray, docs: List[Document]):
+        self._q_cache_vecs = np.vstack([self._q_cache_vecs, query_vec[np.newaxis, :].astype(np.float16)])
+        self._q_cache_docs.append(docs)
+        if len(self._q_cache_docs) > QUERY_CACHE_SIZE:
+            self._q_cache_vecs = self._q_cache_vecs[1:]
+            self._q_cache_docs.pop(0)
+
+    def _invalidate_query_cache(self):
+        self._q_cache_vecs = self._q_cache_vecs[:0]
+        self._q_cache_docs = []
+
+    def delete_by_file_hash(self, file_hashes: List[str]):
+        """
+        Removes all chunks originating from the given source files,
+        used to evict stale content during incremental ingestion.
+        """
+        if not file_hashes:
+            return
+        try:
+            self.vector_store._collection.delete(
+                where={"source_file_hash": {"$in": file_hashes}}
+            )
+            self.parent_store.delete_by_file_hash(file_hashes)
+            self._invalidate_query_cache()
+            logger.info(f"Deleted chunks for {len(file_hashes)} stale files.")
+        except Exception as e:
+            logger.error(f"Error deleting stale chunks: {e}")
+
     def clear(self):
         """
         Clears the vector store.
+        Deletes rows by id instead of dropping the collection: tearing
+        down and recreating the HNSW index costs seconds, while an
+        id-delete keeps the warm collection in place.
         """
         try:
-            self.vector_store.delete_collection()
-            # Re-initialize
-            self.vector_store = Chroma(
-                collection_name="rag_collection",
-                embedding_function=self.embedding_function,
-                persist_directory=self.persist_directory
-            )
+            collection = self.vector_store._collection
+            while True:
+                ids = collection.get(limit=CHROMA_INSERT_BATCH, include=[])["ids"]
+                if not ids:
+                    break
+                collection.delete(ids=ids)
+            self.parent_store.clear()
+            self._invalidate_query_cache()
             logger.info("Vector store cleared.")
         except Exception as e:
-            logger.error(f"Error clearing vector store: {e}")
+            logger.warning(f"Incremental clear failed ({e}); rebuilding collection.")
+            try:
+                self.vector_store.delete_collection()
+                # Re-initialize (reuses the shared client when one was injected)
+                self.vector_store = self._make_store()
+                self.parent_store.clear()
+                self._invalidate_query_cache()
+            except Exception as e2:
+                logger.error(f"Error clearing vector store: {e2}")
@@ -1,16 +1,14 @@
 import streamlit as st
 import os
-import shutil
 import sys
 
 # Add parent directory to path to allow imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.config import (
-    VISION_MODELS, 
-    GENERATION_MODELS, 
-    GUARDRAIL_MODELS, 
-    DATA_FOLDER, 
+    VISION_MODELS,
+    GENERATION_MODELS,
+    GUARDRAIL_MODELS,
     DB_FOLDER,
     GROQ_API_KEY
 )
@@ -21,6 +19,32 @@ from core.logger import setup_logger
 
 logger = setup_logger()
 
+# Heavy resources (embedding model, Chroma client) are loaded once per
+# session instead of on every button press.
+@st.cache_resource
+def get_chroma_client():
+    import chromadb
+    return chromadb.PersistentClient(path=DB_FOLDER)
+
+@st.cache_resource
+def get_retrieval() -> RetrievalEngine:
+    return RetrievalEngine(persist_directory=DB_FOLDER, client=get_chroma_client())
+
+@st.cache_resource
+def get_ingestion(vision_model: str) -> IngestionEngine:
+    return IngestionEngine(vision_model=vision_model)
+
+@st.cache_resource
+def get_generator(model_name: str, guardrail_model) -> GenerationEngine:
+    return GenerationEngine(model_name=model_name, guardrail_model=guardrail_model)
+
+# Memoize retrieval results per (query, top_k): a repeated prompt skips
+# the embedding call and index search entirely. Cleared after ingestion,
+# since new documents can change what any query should return.
+@st.cache_data(show_spinner=False)
+def cached_query(query_text: str, top_k: int = 5):
+    return get_retrieval().query(query_text, top_k=top_k)
+
 st.set_page_config(page_title="RAG Test Case Generator", layout="wide")
 st.title("Multi-Modal Test Case Generator")
 
@@ -71,29 +95,26 @@ with st.sidebar:
         else:
             with st.spinner(f"Ingesting with {selected_vision_key}..."):
                 try:
-                    # Reset Data Folder
-                    if os.path.exists(DATA_FOLDER):
-                        shutil.rmtree(DATA_FOLDER)
-                    os.makedirs(DATA_FOLDER)
-                    
-                    # Save Files
-                    for uploaded_file in uploaded_files:
-                        file_path = os.path.join(DATA_FOLDER, uploaded_file.name)
-                        with open(file_path, "wb") as f:
-                            f.write(uploaded_file.getbuffer())
-                    
-                    st.toast(f"Saved {len(uploaded_files)} files.")
-
-                    # Process
-                    ingestion = IngestionEngine(vision_model=selected_vision_model) 
-                    retrieval = RetrievalEngine(persist_directory=DB_FOLDER)
-                    
-                    retrieval.clear() 
-                    chunks = ingestion.process_folder(DATA_FOLDER)
-                    
-                    retrieval.add_documents(chunks)
-                    
-                    st.success(f"Ingestion Complete! Processed {len(chunks)} chunks.")
+                    # Process uploads straight from memory (incremental:
+                    # unchanged files are skipped, chunks of changed/removed
+                    # files are evicted)
+                    ingestion = get_ingestion(selected_vision_model)
+                    retrieval = get_retrieval()
+
+                    manifest_path = os.path.join(DB_FOLDER, "manifest.json")
+                    chunks = ingestion.process_uploads(
+                        [(f.name, f.getvalue()) for f in uploaded_files],
+                        manifest_path=manifest_path
+                    )
+
+                    retrieval.delete_by_file_hash(ingestion.stale_file_hashes)
+                    retrieval.add_documents(chunks, parents=ingestion.parent_documents)
+                    # Only once the store writes succeeded: an earlier
+                    # manifest save would mark failed files as ingested.
+                    ingestion.save_manifest()
+                    cached_query.clear()
+
+                    st.success(f"Ingestion Complete! Processed {len(chunks)} new/changed chunks.")
                     
                 except Exception as e:
                     st.error(f"Error during ingestion: {e}")
@@ -110,13 +131,9 @@ if st.button("Generate"):
     else:
         with st.spinner(f"Generating with {selected_gen_key}..."):
             try:
-                retrieval = RetrievalEngine(persist_directory=DB_FOLDER)
-                generator = GenerationEngine(
-                    model_name=selected_gen_model, 
-                    guardrail_model=selected_guard_model
-                )
-                
-                docs = retrieval.query(query, top_k=5)
+                generator = get_generator(selected_gen_model, selected_guard_model)
+
+                docs = cached_query(query, top_k=5)
                 context_texts = [d.page_content for d in docs]
                 
                 if not docs:
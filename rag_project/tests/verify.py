@@ -41,7 +41,7 @@ def test_pipeline():
     try:
         retrieval = RetrievalEngine()
         retrieval.clear()
-        retrieval.add_documents(chunks)
+        retrieval.add_documents(chunks, parents=ingestion.parent_documents)
         
         query = "user login requirements"
         docs = retrieval.query(query)